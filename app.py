@@ -7,16 +7,362 @@ Focus: Release angle analysis for 3-point shots
 import gradio as gr
 import cv2
 import mediapipe as mp
+from mediapipe.framework.formats import landmark_pb2
+from mediapipe.tasks import python as mp_tasks
+from mediapipe.tasks.python import vision as mp_vision
 import numpy as np
 from pathlib import Path
+import os
+import shutil
+import subprocess
 import tempfile
-from scipy.ndimage import gaussian_filter1d
+import threading
+import queue
+from collections import deque
+from math import acos, degrees, isnan, sqrt
+import urllib.request
 
 # Initialize MediaPipe Pose
 mp_pose = mp.solutions.pose
 mp_drawing = mp.solutions.drawing_utils
 mp_drawing_styles = mp.solutions.drawing_styles
 
+# Landmark indices, resolved once instead of through the enum on every frame
+LEFT_SHOULDER = mp_pose.PoseLandmark.LEFT_SHOULDER.value
+LEFT_ELBOW = mp_pose.PoseLandmark.LEFT_ELBOW.value
+LEFT_WRIST = mp_pose.PoseLandmark.LEFT_WRIST.value
+RIGHT_SHOULDER = mp_pose.PoseLandmark.RIGHT_SHOULDER.value
+RIGHT_ELBOW = mp_pose.PoseLandmark.RIGHT_ELBOW.value
+RIGHT_WRIST = mp_pose.PoseLandmark.RIGHT_WRIST.value
+
+# Columns of the (33, 4) float32 arrays landmarks are kept in
+LANDMARK_X, LANDMARK_Y, LANDMARK_Z, LANDMARK_VISIBILITY = range(4)
+
+# Shoulder, elbow and wrist landmarks of each possible shooting arm
+ARM_LANDMARKS = {
+    'right': (RIGHT_SHOULDER, RIGHT_ELBOW, RIGHT_WRIST),
+    'left': (LEFT_SHOULDER, LEFT_ELBOW, LEFT_WRIST),
+}
+
+# The shooting arm is picked from wrist visibility over this many detections
+HAND_DETECTION_FRAMES = 10
+
+# Frames are downscaled to this width before pose detection. Landmarks come
+# back normalized, so they still map onto the full-resolution output frame.
+POSE_INPUT_WIDTH = 480
+
+# Run resize/colour conversion through OpenCV's OpenCL path (T-API) when it is
+# enabled on a GPU, leaving CPU cores to MediaPipe. CPU-only OpenCL runtimes
+# also report haveOpenCL(), but there the T-API only adds upload/download copies.
+USE_OPENCL = (
+    cv2.ocl.haveOpenCL() and cv2.ocl.useOpenCL()
+    and bool(cv2.ocl.Device.getDefault().type() & cv2.ocl.Device_TYPE_GPU)
+)
+
+# Pose detection runs on every Nth frame so that it samples at least this rate;
+# the release motion is slow enough that 15 Hz locates it reliably
+ANALYSIS_FPS = 15
+
+# Release detection smooths the per-frame wrist velocity with a Gaussian of
+# this sigma in frames (truncated at four sigma, like scipy.ndimage), and the
+# release frame is held at the end of the output video for this long
+RELEASE_SMOOTHING_SIGMA = 1.0
+RELEASE_SMOOTHING_RADIUS = int(4 * RELEASE_SMOOTHING_SIGMA + 0.5)
+RELEASE_SMOOTHING_WEIGHTS = np.exp(-0.5 * (
+    np.arange(-RELEASE_SMOOTHING_RADIUS, RELEASE_SMOOTHING_RADIUS + 1) / RELEASE_SMOOTHING_SIGMA
+) ** 2)
+RELEASE_SMOOTHING_WEIGHTS = (RELEASE_SMOOTHING_WEIGHTS / RELEASE_SMOOTHING_WEIGHTS.sum()).tolist()
+RELEASE_HOLD_SECONDS = 1.0
+
+# Maximum number of frames buffered between the decode, inference and encode threads
+FRAME_QUEUE_SIZE = 8
+
+# Queued by the reader in place of frames that were not retrieved
+SKIPPED_FRAME = object()
+
+# ffmpeg output encoding: multi-threaded libx264 that plays in browsers
+FFMPEG_ENCODE_ARGS = [
+    '-c:v', 'libx264', '-preset', 'ultrafast', '-pix_fmt', 'yuv420p', '-threads', '0'
+]
+
+# Without overlays, let ffmpeg re-encode the input directly instead of piping
+# every frame through Python (needs a spare core for ffmpeg's own decode)
+REPORT_ONLY_PASSTHROUGH = (os.cpu_count() or 1) > 1
+
+# MediaPipe Pose model variants offered in the UI (label, model_complexity)
+MODEL_COMPLEXITY_CHOICES = [
+    ("Fast", 0),
+    ("Balanced", 1),
+    ("Accurate", 2),
+]
+
+# PoseLandmarker model bundles, downloaded into MODEL_DIR on first use
+MODEL_DIR = Path(__file__).parent / "models"
+POSE_MODEL_NAMES = {
+    0: "pose_landmarker_lite",
+    1: "pose_landmarker_full",
+    2: "pose_landmarker_heavy",
+}
+POSE_MODEL_URL = (
+    "https://storage.googleapis.com/mediapipe-models/pose_landmarker/"
+    "{name}/float16/latest/{name}.task"
+)
+# Seconds to wait on the model server before giving up on a download
+MODEL_DOWNLOAD_TIMEOUT = 30
+# A locally built INT8-quantized bundle (e.g. models/pose_landmarker_lite_int8.task)
+# is used instead of the float16 download when present. Quantized kernels are
+# not faster on every CPU, so benchmark one before deploying it.
+QUANTIZED_MODEL_SUFFIX = "_int8"
+
+
+def get_pose_model_path(model_complexity):
+    """
+    Return the local path of the PoseLandmarker model bundle, downloading it if needed.
+    A quantized bundle in MODEL_DIR takes precedence over the download.
+    Args:
+        model_complexity: 0=lite, 1=full, 2=heavy
+    Returns:
+        Path to the .task file as a string
+    """
+    name = POSE_MODEL_NAMES[model_complexity]
+    quantized_path = MODEL_DIR / f"{name}{QUANTIZED_MODEL_SUFFIX}.task"
+    if quantized_path.exists():
+        return str(quantized_path)
+    
+    model_path = MODEL_DIR / f"{name}.task"
+    if not model_path.exists():
+        MODEL_DIR.mkdir(parents=True, exist_ok=True)
+        # Download to a temporary name so an interrupted download is not reused
+        partial_path = model_path.with_suffix('.part')
+        url = POSE_MODEL_URL.format(name=name)
+        with urllib.request.urlopen(url, timeout=MODEL_DOWNLOAD_TIMEOUT) as response:
+            with open(partial_path, 'wb') as partial_file:
+                shutil.copyfileobj(response, partial_file)
+        partial_path.replace(model_path)
+    
+    return str(model_path)
+
+
+def pose_landmarker_options(model_path, delegate):
+    """
+    Build PoseLandmarker options for frame-by-frame video processing.
+    """
+    return mp_vision.PoseLandmarkerOptions(
+        base_options=mp_tasks.BaseOptions(
+            model_asset_path=model_path,
+            delegate=delegate
+        ),
+        running_mode=mp_vision.RunningMode.VIDEO,
+        min_pose_detection_confidence=0.5,
+        min_pose_presence_confidence=0.5,
+        min_tracking_confidence=0.5
+    )
+
+
+def create_pose_landmarker(model_complexity):
+    """
+    Create a PoseLandmarker, preferring the GPU delegate.
+    Falls back to the CPU delegate (MediaPipe's XNNPACK kernels) when no
+    supported GPU is available.
+    """
+    model_path = get_pose_model_path(model_complexity)
+    
+    try:
+        return mp_vision.PoseLandmarker.create_from_options(
+            pose_landmarker_options(model_path, mp_tasks.BaseOptions.Delegate.GPU)
+        )
+    except (RuntimeError, NotImplementedError):
+        # No usable GPU context (e.g. headless server without EGL)
+        return mp_vision.PoseLandmarker.create_from_options(
+            pose_landmarker_options(model_path, mp_tasks.BaseOptions.Delegate.CPU)
+        )
+
+
+def to_landmark_array(pose_landmarks):
+    """
+    Copy PoseLandmarker landmarks into a (33, 4) float32 array of x, y, z and
+    visibility, so later lookups are plain array indexing instead of attribute
+    access on landmark objects.
+    """
+    return np.array(
+        [(landmark.x, landmark.y, landmark.z, landmark.visibility) for landmark in pose_landmarks],
+        dtype=np.float32
+    )
+
+
+def to_landmark_proto(pose_landmarks):
+    """
+    Convert a landmark array to the proto format expected by mp_drawing.
+    """
+    landmark_list = landmark_pb2.NormalizedLandmarkList()
+    landmark_list.landmark.extend([
+        landmark_pb2.NormalizedLandmark(x=x, y=y, z=z, visibility=visibility)
+        for x, y, z, visibility in pose_landmarks.tolist()
+    ])
+    return landmark_list
+
+
+class FFmpegVideoWriter:
+    """
+    Minimal cv2.VideoWriter replacement that pipes raw BGR frames to ffmpeg.
+    Encodes with multi-threaded libx264 (ultrafast preset), which is faster
+    than OpenCV's single-threaded mp4v encoder and plays in browsers.
+    
+    With source_video set, the output starts with that video and written
+    frames are appended after it. A second ffmpeg re-encodes the source in
+    the background from the start, the written frames are encoded on their
+    own, and release() joins the two parts without re-encoding.
+    """
+    
+    def __init__(self, output_path, fps, frame_size, source_video=None):
+        width, height = frame_size
+        # yuv420p needs even dimensions; both parts get the same size and
+        # aspect ratio so that they can be joined by a stream copy
+        filters = 'setsar=1,scale=trunc(iw/2)*2:trunc(ih/2)*2'
+        self.output_path = output_path
+        self.frames_written = 0
+        self.source_process = None
+        self.source_part = None
+        self.concat_list = None
+        if source_video is not None:
+            # Every decoded frame is kept and retimed to fps, like the frames
+            # piped through Python when overlays are drawn
+            self.source_part = tempfile.mktemp(suffix='.mp4')
+            self.concat_list = tempfile.mktemp(suffix='.txt')
+            self.source_process = subprocess.Popen([
+                'ffmpeg', '-y', '-loglevel', 'error', '-nostdin',
+                '-i', source_video, '-map', '0:v:0',
+                '-vf', f'scale={width}:{height},setpts=N/{fps}/TB,{filters}', '-r', str(fps),
+                *FFMPEG_ENCODE_ARGS, self.source_part
+            ])
+            output_path = tempfile.mktemp(suffix='.mp4')
+        self.frames_part = output_path
+        self.process = subprocess.Popen([
+            'ffmpeg', '-y', '-loglevel', 'error',
+            '-f', 'rawvideo', '-pix_fmt', 'bgr24',
+            '-s', f'{width}x{height}', '-r', str(fps), '-i', '-',
+            '-vf', filters, *FFMPEG_ENCODE_ARGS, output_path
+        ], stdin=subprocess.PIPE)
+    
+    def write(self, frame):
+        # Write the frame's memory directly instead of copying it with tobytes()
+        self.process.stdin.write(np.ascontiguousarray(frame).data)
+        self.frames_written += 1
+    
+    def release(self):
+        self.process.stdin.close()
+        if self.source_process is None:
+            if self.process.wait() != 0:
+                raise RuntimeError(f"ffmpeg exited with code {self.process.returncode}")
+            return
+        
+        try:
+            for process in (self.process, self.source_process):
+                if process.wait() != 0:
+                    raise RuntimeError(f"ffmpeg exited with code {process.returncode}")
+            if not self.frames_written:
+                os.replace(self.source_part, self.output_path)
+                return
+            # The concat demuxer joins same-codec parts by copying packets
+            with open(self.concat_list, 'w') as concat_list:
+                concat_list.writelines(f"file '{part}'\n" for part in (self.source_part, self.frames_part))
+            joined = subprocess.run([
+                'ffmpeg', '-y', '-loglevel', 'error',
+                '-f', 'concat', '-safe', '0', '-i', self.concat_list, '-c', 'copy', self.output_path
+            ])
+            if joined.returncode != 0:
+                raise RuntimeError(f"ffmpeg exited with code {joined.returncode}")
+        finally:
+            # Also stops the source encode when the frames part failed
+            self.source_process.kill()
+            self.source_process.wait()
+            self.remove_parts()
+    
+    def abort(self):
+        # Stop ffmpeg without letting it finish the output
+        for process in (self.process, self.source_process):
+            if process is not None:
+                process.kill()
+                process.wait()
+        try:
+            self.process.stdin.close()
+        except BrokenPipeError:
+            pass
+        if self.source_process is not None:
+            self.remove_parts()
+    
+    def remove_parts(self):
+        # Temporary files of the source_video mode
+        for part in (self.source_part, self.frames_part, self.concat_list):
+            if os.path.exists(part):
+                os.remove(part)
+
+
+def open_video_writer(output_path, fps, frame_size):
+    """
+    Open a video writer, using ffmpeg when available and OpenCV otherwise.
+    """
+    if shutil.which('ffmpeg'):
+        return FFmpegVideoWriter(output_path, fps, frame_size)
+    
+    fourcc = cv2.VideoWriter_fourcc(*'mp4v')
+    return cv2.VideoWriter(output_path, fourcc, fps, frame_size)
+
+
+def discard_video_writer(out, output_path):
+    """
+    Close a writer whose output is abandoned after an error and delete the
+    partial file, without raising errors that would hide the original one.
+    """
+    if isinstance(out, FFmpegVideoWriter):
+        out.abort()
+    else:
+        out.release()
+    if os.path.exists(output_path):
+        os.remove(output_path)
+
+
+def read_frames(cap, frame_queue, stop_event, stride=1):
+    """
+    Decode frames into frame_queue until the video ends or stop_event is set.
+    Runs on its own thread; None marks the end of the stream.
+    
+    With stride > 1 only every stride-th frame is retrieved (converted to BGR
+    and copied out of the decoder); the others are queued as SKIPPED_FRAME so
+    frame indices stay aligned.
+    """
+    frame_idx = 0
+    while not stop_event.is_set():
+        if not cap.grab():
+            break
+        if frame_idx % stride == 0:
+            success, frame = cap.retrieve()
+            if not success:
+                break
+            frame_queue.put(frame)
+        else:
+            frame_queue.put(SKIPPED_FRAME)
+        frame_idx += 1
+    frame_queue.put(None)
+
+
+def write_frames(out, frame_queue, errors):
+    """
+    Write frames from frame_queue until None is received.
+    Runs on its own thread. The first write error is stored in errors and
+    later frames are discarded, so producers never block on a full queue.
+    """
+    while True:
+        frame = frame_queue.get()
+        if frame is None:
+            break
+        if errors:
+            continue
+        try:
+            out.write(frame)
+        except Exception as e:
+            errors.append(e)
+
 
 def calculate_angle(point1, point2, point3):
     """
@@ -26,40 +372,88 @@ def calculate_angle(point1, point2, point3):
     Returns:
         Angle in degrees
     """
-    # Convert points to numpy arrays
-    a = np.array(point1)
-    b = np.array(point2)  # vertex point
-    c = np.array(point3)
-    
-    # Calculate vectors
-    ba = a - b
-    bc = c - b
+    # Calculate vectors from the vertex point (plain floats; NumPy call
+    # overhead dominates for two 2D vectors)
+    bax, bay = point1[0] - point2[0], point1[1] - point2[1]
+    bcx, bcy = point3[0] - point2[0], point3[1] - point2[1]
     
     # Calculate angle using dot product
-    cosine_angle = np.dot(ba, bc) / (np.linalg.norm(ba) * np.linalg.norm(bc))
-    angle = np.arccos(np.clip(cosine_angle, -1.0, 1.0))
+    dot = bax * bcx + bay * bcy
+    norm = sqrt((bax * bax + bay * bay) * (bcx * bcx + bcy * bcy))
+    cosine_angle = 1.0 if norm == 0 else max(-1.0, min(1.0, dot / norm))
     
-    return np.degrees(angle)
+    return degrees(acos(cosine_angle))
 
 
-def analyze_release_angle(landmarks, frame_width, frame_height):
+def add_wrist_sample(wrist_positions, frame_idx, wrist_y):
+    """
+    Append a sampled wrist position, linearly interpolating the frames since
+    the previous sample like np.interp (NaN next to a missing pose).
+    Args:
+        wrist_positions: Per-frame wrist y positions so far, ending at the previous sample
+        frame_idx: Frame the new sample was taken at
+        wrist_y: Wrist y position in pixels, or NaN without a pose
+    """
+    if wrist_positions:
+        previous_idx = len(wrist_positions) - 1
+        previous_y = wrist_positions[-1]
+        slope = (wrist_y - previous_y) / (frame_idx - previous_idx)
+        for offset in range(1, frame_idx - previous_idx):
+            wrist_positions.append(previous_y + slope * offset)
+    wrist_positions.append(wrist_y)
+
+
+def wrist_velocity(wrist_positions, frame_idx):
+    """
+    Wrist velocity at one frame, like np.gradient: a central difference inside
+    the clip and a one-sided one at either end. Missing poses count as no motion.
+    """
+    last_idx = len(wrist_positions) - 1
+    if last_idx < 1:
+        return 0.0
+    if frame_idx == 0:
+        dy = wrist_positions[1] - wrist_positions[0]
+    elif frame_idx == last_idx:
+        dy = wrist_positions[last_idx] - wrist_positions[last_idx - 1]
+    else:
+        dy = (wrist_positions[frame_idx + 1] - wrist_positions[frame_idx - 1]) / 2
+    return 0.0 if isnan(dy) else dy
+
+
+def smoothed_wrist_velocity(wrist_positions, frame_idx):
+    """
+    Gaussian-smoothed wrist velocity at one frame. Velocities past either end
+    of the clip are mirrored, like scipy.ndimage's default 'reflect' mode.
+    """
+    frame_count = len(wrist_positions)
+    smoothed = 0.0
+    for offset, weight in enumerate(RELEASE_SMOOTHING_WEIGHTS, -RELEASE_SMOOTHING_RADIUS):
+        idx = frame_idx + offset
+        if idx < 0:
+            idx = -idx - 1
+        elif idx >= frame_count:
+            idx = 2 * frame_count - idx - 1
+        # Clips shorter than the kernel
+        idx = min(max(idx, 0), frame_count - 1)
+        smoothed += weight * wrist_velocity(wrist_positions, idx)
+    return smoothed
+
+
+def analyze_release_angle(landmarks, frame_width, frame_height, shooting_arm='right'):
     """
     Analyze the release angle of the shooting arm.
-    Focuses on right arm (can be modified for left-handed shooters).
+    Args:
+        landmarks: Landmark array as returned by to_landmark_array
+        shooting_arm: 'right' or 'left'
     
     Returns:
         - release_angle: The angle at the elbow during release
         - feedback: Text feedback on the shot
     """
-    # Get key landmarks (right arm)
-    right_shoulder = landmarks[mp_pose.PoseLandmark.RIGHT_SHOULDER.value]
-    right_elbow = landmarks[mp_pose.PoseLandmark.RIGHT_ELBOW.value]
-    right_wrist = landmarks[mp_pose.PoseLandmark.RIGHT_WRIST.value]
-    
-    # Convert normalized coordinates to pixel coordinates
-    shoulder = (right_shoulder.x * frame_width, right_shoulder.y * frame_height)
-    elbow = (right_elbow.x * frame_width, right_elbow.y * frame_height)
-    wrist = (right_wrist.x * frame_width, right_wrist.y * frame_height)
+    # Get key landmarks of the shooting arm and convert normalized
+    # coordinates to pixel coordinates
+    arm = landmarks[ARM_LANDMARKS[shooting_arm], LANDMARK_X:LANDMARK_Y + 1]
+    shoulder, elbow, wrist = (arm * (frame_width, frame_height)).tolist()
     
     # Calculate elbow angle
     elbow_angle = calculate_angle(shoulder, elbow, wrist)
@@ -82,13 +476,60 @@ def analyze_release_angle(landmarks, frame_width, frame_height):
     return elbow_angle, feedback, status
 
 
-def process_video(video_path, show_skeleton=True):
+def prepare_pose_input(frame, pose_size, resize_buffer, rgb_buffer):
+    """
+    Downscale a BGR frame for inference and convert it to RGB.
+    Args:
+        frame: BGR frame as read from the video (left untouched for drawing)
+        pose_size: (width, height) to resize to, or None to keep the frame size
+        resize_buffer: Preallocated uint8 array of the pose input shape for the
+            downscaled BGR frame (unused when pose_size is None)
+        rgb_buffer: Preallocated uint8 array of the pose input shape for the
+            RGB output, reused across frames (MediaPipe copies the pixels it is given)
+    Returns:
+        RGB numpy array
+    """
+    if USE_OPENCL:
+        image = cv2.UMat(frame)
+        if pose_size is not None:
+            image = cv2.resize(image, pose_size, interpolation=cv2.INTER_AREA)
+        # MediaPipe needs the pixels back in host memory
+        return cv2.cvtColor(image, cv2.COLOR_BGR2RGB).get()
+    
+    # Resize first so the colour conversion runs on the small frame. Each step
+    # writes into its own reused buffer, so the conversion never reads and
+    # writes the same array (OpenCV may copy the source of an in-place call).
+    if pose_size is not None:
+        frame = cv2.resize(frame, pose_size, dst=resize_buffer, interpolation=cv2.INTER_AREA)
+    return cv2.cvtColor(frame, cv2.COLOR_BGR2RGB, dst=rgb_buffer)
+
+
+def draw_angle_overlay(image, pose_landmarks, frame_width, frame_height, shooting_arm):
+    """
+    Draw the elbow angle (or a no-pose notice) in the top-left corner of a frame.
+    """
+    if pose_landmarks is not None:
+        angle, _, _ = analyze_release_angle(pose_landmarks, frame_width, frame_height, shooting_arm)
+        cv2.putText(image, f'Elbow Angle: {angle:.1f}°', 
+                (10, 30), cv2.FONT_HERSHEY_SIMPLEX, 
+                0.7, (255, 255, 255), 2)
+    else:
+        # No pose detected
+        cv2.putText(image, 'No pose detected', 
+                (10, 30), cv2.FONT_HERSHEY_SIMPLEX, 
+                0.7, (0, 0, 255), 2)
+
+
+def process_video(video_path, show_skeleton=True, model_complexity=0, show_angle_overlay=False):
     """
     Process video and analyze basketball shooting form.
     
     Args:
         video_path: Path to input video
         show_skeleton: Whether to overlay skeleton on output video
+        model_complexity: MediaPipe Pose model (0=lite, 1=full, 2=heavy)
+        show_angle_overlay: Whether to draw the elbow angle on every frame
+            (the release frame always shows it)
     
     Returns:
         - output_video_path: Path to processed video
@@ -97,6 +538,13 @@ def process_video(video_path, show_skeleton=True):
     if video_path is None:
         return None, "Please upload a video file."
     
+    # Fetch the model up front so a failed download (e.g. when offline) is
+    # reported like other input problems instead of raised mid-analysis
+    try:
+        get_pose_model_path(model_complexity)
+    except OSError as e:
+        return None, f"Could not download the pose model ({e}). Check your internet connection and try again."
+    
     # Open video
     cap = cv2.VideoCapture(video_path)
     
@@ -106,171 +554,243 @@ def process_video(video_path, show_skeleton=True):
     height = int(cap.get(cv2.CAP_PROP_FRAME_HEIGHT))
     total_frames = int(cap.get(cv2.CAP_PROP_FRAME_COUNT))
     
-    # Create temporary output video file
+    # The writers need a frame rate, so unreadable files are rejected up front
+    if not cap.isOpened() or fps <= 0:
+        cap.release()
+        return None, "Could not read the video file. Please upload a valid video (e.g. MP4 or MOV)."
+    
+    # Size of the frames fed to MediaPipe (keeps aspect ratio)
+    if width > POSE_INPUT_WIDTH:
+        pose_size = (POSE_INPUT_WIDTH, max(1, round(height * POSE_INPUT_WIDTH / width)))
+    else:
+        pose_size = None
+    pose_width, pose_height = pose_size if pose_size is not None else (width, height)
+    rgb_buffer = np.empty((pose_height, pose_width, 3), dtype=np.uint8)
+    resize_buffer = np.empty_like(rgb_buffer) if pose_size is not None else None
+    
+    # Create temporary output video file. Without per-frame overlays nothing
+    # needs drawing, so frames are only analyzed here while ffmpeg re-encodes
+    # the input video itself on other cores; only the release frame is written.
+    # ffmpeg decodes the input a second time, which only pays off with spare cores.
     output_path = tempfile.mktemp(suffix='.mp4')
-    fourcc = cv2.VideoWriter_fourcc(*'mp4v')
-    out = cv2.VideoWriter(output_path, fourcc, fps, (width, height))
+    report_only = (
+        not show_skeleton and not show_angle_overlay
+        and REPORT_ONLY_PASSTHROUGH and shutil.which('ffmpeg')
+    )
+    if report_only:
+        out = FFmpegVideoWriter(output_path, fps, (width, height), source_video=video_path)
+    else:
+        out = open_video_writer(output_path, fps, (width, height))
     
-    # Storage for analysis
-    angles_data = []
+    # Analysis at the release frame
     best_frame_idx = 0
-    best_wrist_height = 0
-    
-    # First pass: Collect wrist positions
-    with mp_pose.Pose(
-        min_detection_confidence=0.5,
-        min_tracking_confidence=0.5,
-        model_complexity=1
-    ) as pose:
-        
-        frame_idx = 0
-        wrist_positions = []
-        
-        while cap.isOpened():
-            success, frame = cap.read()
-            if not success:
-                break
-            
-            # Convert BGR to RGB
-            image = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
-            image.flags.writeable = False
+    release_angle = None
+    release_feedback = None
+    release_status = None
+    
+    # The release frame is found on the fly: sampled wrist positions are
+    # interpolated back to one value per frame (a float each), and every frame
+    # is checked for the fastest smoothed upward motion in the middle 80% of
+    # the video once the smoothing window around it is known. Only the frames
+    # still waiting for their check are buffered.
+    stride = max(1, fps // ANALYSIS_FPS)
+    search_start = int(total_frames * 0.1)
+    search_end = int(total_frames * 0.9) if total_frames > 0 else np.inf
+    wrist_positions = []
+    pending_frames = deque()
+    last_ready_idx = -1
+    best_dy = np.inf
+    release_sample = None
+    last_frame = None
+    
+    # Decoding, inference/annotation and encoding run on separate threads
+    # connected by bounded queues, so decoding and encoding overlap with
+    # MediaPipe. The landmarker is only used from this thread.
+    read_queue = queue.Queue(maxsize=FRAME_QUEUE_SIZE)
+    write_queue = queue.Queue(maxsize=FRAME_QUEUE_SIZE)
+    stop_reading = threading.Event()
+    write_errors = []
+    # Without an output to write, only the sampled frames are ever looked at
+    read_stride = stride if report_only else 1
+    reader = threading.Thread(
+        target=read_frames, args=(cap, read_queue, stop_reading, read_stride), daemon=True
+    )
+    reader.start()
+    if not report_only:
+        writer = threading.Thread(target=write_frames, args=(out, write_queue, write_errors), daemon=True)
+        writer.start()
+    reading_done = False
+    
+    # Shooting arm detection
+    shooting_arm = 'right'
+    wrist_idx = RIGHT_WRIST
+    right_visibility = 0.0
+    left_visibility = 0.0
+    hand_frames = 0
+    
+    completed = False
+    try:
+        # Detection stays on one VIDEO-mode landmarker, which tracks the pose
+        # between frames. IMAGE-mode landmarkers on a thread pool lose that
+        # tracking, which changes the measured angles. The tracking state
+        # cannot be reset, so the landmarker is created for each video.
+        with create_pose_landmarker(model_complexity) as landmarker:
             
-            # Process with MediaPipe
-            results = pose.process(image)
+            frame_idx = 0
+            pose_landmarks = None
             
-            if results.pose_landmarks:
-                landmarks = results.pose_landmarks.landmark
-                # Track right wrist y-position (use left if right not visible)
-                right_wrist = landmarks[mp_pose.PoseLandmark.RIGHT_WRIST.value]
-                left_wrist = landmarks[mp_pose.PoseLandmark.LEFT_WRIST.value]
+            while True:
+                # Check the buffered frames whose smoothing window is complete
+                while pending_frames and pending_frames[0][0] <= last_ready_idx:
+                    pending_idx, last_frame = pending_frames.popleft()
+                    if search_start <= pending_idx < search_end:
+                        dy_smooth = smoothed_wrist_velocity(wrist_positions, pending_idx)
+                        if dy_smooth < best_dy:
+                            best_dy = dy_smooth
+                            release_sample = last_frame
+                if reading_done:
+                    break
                 
-                if right_wrist.visibility > left_wrist.visibility:
-                    wrist_y = right_wrist.y * height
-                else:
-                    wrist_y = left_wrist.y * height
+                image = read_queue.get()
+                if image is None:
+                    reading_done = True
+                    # Frames after the last sample keep its position, as with
+                    # np.interp; the remaining frames can all be checked now
+                    if wrist_positions:
+                        wrist_positions.extend([wrist_positions[-1]] * (frame_idx - len(wrist_positions)))
+                    last_ready_idx = frame_idx
+                    continue
+                
+                # Run pose detection on sampled frames; the frames in between
+                # reuse the last detection
+                if frame_idx % stride == 0:
+                    rgb = prepare_pose_input(image, pose_size, resize_buffer, rgb_buffer)
+                    mp_image = mp.Image(image_format=mp.ImageFormat.SRGB, data=rgb)
+                    
+                    # Process with MediaPipe (timestamps must increase monotonically)
+                    timestamp_ms = frame_idx * 1000 // max(fps, 1)
+                    results = landmarker.detect_for_video(mp_image, timestamp_ms)
+                    pose_landmarks = (
+                        to_landmark_array(results.pose_landmarks[0]) if results.pose_landmarks else None
+                    )
+                    
+                    if pose_landmarks is not None:
+                        # Pick the shooting arm from wrist visibility over the
+                        # first detections, then only track that wrist
+                        if hand_frames < HAND_DETECTION_FRAMES:
+                            right_visibility += pose_landmarks[RIGHT_WRIST, LANDMARK_VISIBILITY]
+                            left_visibility += pose_landmarks[LEFT_WRIST, LANDMARK_VISIBILITY]
+                            hand_frames += 1
+                            shooting_arm = 'right' if right_visibility >= left_visibility else 'left'
+                            wrist_idx = ARM_LANDMARKS[shooting_arm][2]
+                        
+                        wrist_y = float(pose_landmarks[wrist_idx, LANDMARK_Y]) * height
+                    else:
+                        wrist_y = np.nan
+                    
+                    add_wrist_sample(wrist_positions, frame_idx, wrist_y)
+                    # A frame's smoothed velocity needs the positions up to one
+                    # frame past its smoothing window
+                    last_ready_idx = len(wrist_positions) - RELEASE_SMOOTHING_RADIUS - 2
+                    # The buffered image is annotated in place below
+                    current_sample = (frame_idx, image, pose_landmarks)
+                
+                # Frames in between stand for the sample whose detection they
+                # reuse, so the reported frame, image and angle all come from
+                # the frame that was actually detected
+                pending_frames.append((frame_idx, current_sample))
                 
-                wrist_positions.append(wrist_y)
-            else:
-                wrist_positions.append(np.nan)
-            
-            frame_idx += 1
-
-    cap.release()
-
-    # Detect release frame using velocity (gradient)
-    wrist_array = np.array(wrist_positions)
-    dy = np.gradient(wrist_array)  # Velocity
-    dy_smooth = gaussian_filter1d(np.nan_to_num(dy, nan=0.0), sigma=1.0)
-
-    # Find fastest upward motion in middle 80% of video
-    n = len(dy_smooth)
-    if n > 0:
-        search_start = int(n * 0.1)
-        search_end = int(n * 0.9)
-        search_slice = dy_smooth[search_start:search_end]
-        best_frame_idx = int(np.argmin(search_slice) + search_start)
-    else:
-        best_frame_idx = 0
-
-    # Second pass: annotate video and analyze
-    cap = cv2.VideoCapture(video_path)
-
-    with mp_pose.Pose(
-        min_detection_confidence=0.5,
-        min_tracking_confidence=0.5,
-        model_complexity=1
-    ) as pose:
-        
-        frame_idx = 0
-        while cap.isOpened():
-            success, frame = cap.read()
-            if not success:
-                break
-            
-            # Convert BGR to RGB
-            image = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
-            image.flags.writeable = False
-            
-            # Process with MediaPipe
-            results = pose.process(image)
-            
-            # Convert back to BGR for OpenCV
-            image.flags.writeable = True
-            image = cv2.cvtColor(image, cv2.COLOR_RGB2BGR)
-            
-            if results.pose_landmarks:
                 # Draw skeleton if requested
-                if show_skeleton:
+                if pose_landmarks is not None and show_skeleton:
                     mp_drawing.draw_landmarks(
                         image,
-                        results.pose_landmarks,
+                        to_landmark_proto(pose_landmarks),
                         mp_pose.POSE_CONNECTIONS,
                         landmark_drawing_spec=mp_drawing_styles.get_default_pose_landmarks_style()
                     )
                 
-                # Analyze release angle
-                landmarks = results.pose_landmarks.landmark
-                angle, feedback, status = analyze_release_angle(landmarks, width, height)
+                # Add angle text to every frame only if requested
+                if show_angle_overlay:
+                    draw_angle_overlay(image, pose_landmarks, width, height, shooting_arm)
                 
-                # Store analysis for release frame
-                if frame_idx == best_frame_idx:
-                    angles_data.append({
-                        'frame': frame_idx,
-                        'angle': angle,
-                        'feedback': feedback,
-                        'status': status
-                    })
-                
-                # Add angle text to frame
-                cv2.putText(image, f'Elbow Angle: {angle:.1f}°', 
-                        (10, 30), cv2.FONT_HERSHEY_SIMPLEX, 
-                        0.7, (255, 255, 255), 2)
-                
-                # Mark release frame
-                if frame_idx == best_frame_idx:
-                    cv2.putText(image, 'RELEASE POINT', 
-                            (width - 250, 40), cv2.FONT_HERSHEY_SIMPLEX, 
-                            1.0, (0, 0, 255), 3)
-            else:
-                # No pose detected
-                cv2.putText(image, 'No pose detected', 
-                        (10, 30), cv2.FONT_HERSHEY_SIMPLEX, 
-                        0.7, (0, 0, 255), 2)
-            
-            out.write(image)
-            frame_idx += 1
+                if not report_only:
+                    write_queue.put(image)
+                frame_idx += 1
+        completed = True
+    finally:
+        # If processing failed, drain the reader so it can stop
+        if not reading_done:
+            stop_reading.set()
+            while read_queue.get() is not None:
+                pass
+        reader.join()
+        if not report_only:
+            write_queue.put(None)
+            writer.join()
+        cap.release()
+        
+        # Don't leave ffmpeg waiting or a half-written video behind
+        if not completed or write_errors:
+            discard_video_writer(out, output_path)
+
+    if write_errors:
+        raise write_errors[0]
+
+    # Clips too short for the search window fall back to the last frame
+    if release_sample is None:
+        release_sample = last_frame
+    
+    # Without a detected pose there is no release point to analyze or show
+    if release_sample is not None and release_sample[2] is not None:
+        best_frame_idx, release_image, release_landmarks = release_sample
+        
+        # Analyze release angle
+        release_angle, release_feedback, release_status = analyze_release_angle(
+            release_landmarks, width, height, shooting_arm
+        )
+        
+        # The release frame is only known once the video has been written,
+        # so it is appended as a short freeze frame (always with the angle)
+        if not show_angle_overlay:
+            draw_angle_overlay(release_image, release_landmarks, width, height, shooting_arm)
+        cv2.putText(release_image, 'RELEASE POINT', 
+                (width - 250, 40), cv2.FONT_HERSHEY_SIMPLEX, 
+                1.0, (0, 0, 255), 3)
+        try:
+            for _ in range(max(1, int(fps * RELEASE_HOLD_SECONDS))):
+                out.write(release_image)
+        except Exception:
+            discard_video_writer(out, output_path)
+            raise
 
-    cap.release()
     out.release()
     
     # Generate analysis report
-    if angles_data:
-        # Get the analysis at the release point (highest wrist)
-        release_data = angles_data[best_frame_idx] if best_frame_idx < len(angles_data) else angles_data[-1]
-        
+    if release_angle is not None:
         analysis = f"""
 ## 🏀 Basketball Shot Analysis Report
 
 ### Release Point Analysis
-**Frame:** {release_data['frame']}/{total_frames}
-**Elbow Angle at Release:** {release_data['angle']:.1f}°
+**Frame:** {best_frame_idx}/{total_frames}
+**Shooting Arm:** {shooting_arm.capitalize()}
+**Elbow Angle at Release:** {release_angle:.1f}°
 
 ### Feedback
-{release_data['feedback']}
+{release_feedback}
 
 ### Technical Details
 - **Optimal Range:** 90-120° at the elbow
-- **Your Angle:** {release_data['angle']:.1f}°
-- **Status:** {release_data['status'].upper()}
+- **Your Angle:** {release_angle:.1f}°
+- **Status:** {release_status.upper()}
 
 ### Recommendations
 """
         
-        if release_data['status'] == 'good':
+        if release_status == 'good':
             analysis += "- Your release angle is in the optimal range! Keep practicing this form.\n"
             analysis += "- Focus on consistency - try to replicate this angle on every shot.\n"
-        elif release_data['status'] == 'warning':
-            if release_data['angle'] < 90:
+        elif release_status == 'warning':
+            if release_angle < 90:
                 analysis += "- Try extending your arm slightly more at the release point.\n"
                 analysis += "- Focus on a smooth, upward motion rather than pushing the ball.\n"
             else:
@@ -313,7 +833,7 @@ def create_interface():
             
             ### How to use:
             1. Upload a video of a basketball shot (3-point attempt recommended)
-            2. Choose whether to show the skeleton overlay
+            2. Choose whether to show the skeleton overlay and the analysis speed
             3. Click "Analyze Shot" to get detailed feedback
             
             **Tip:** For best results, ensure the shooter is clearly visible and the shooting arm is in frame.
@@ -328,6 +848,17 @@ def create_interface():
                     value=True,
                     info="Display pose detection skeleton on the output video"
                 )
+                model_dropdown = gr.Dropdown(
+                    label="Analysis Speed",
+                    choices=MODEL_COMPLEXITY_CHOICES,
+                    value=0,
+                    info="Fast uses the lite pose model; Accurate is slower but more precise"
+                )
+                angle_checkbox = gr.Checkbox(
+                    label="Show Elbow Angle on Every Frame",
+                    value=False,
+                    info="The release frame always shows the angle"
+                )
                 analyze_btn = gr.Button("🔍 Analyze Shot", variant="primary", size="lg")
                 
                 gr.Markdown(
@@ -351,7 +882,7 @@ def create_interface():
         # Set up the analysis action
         analyze_btn.click(
             fn=process_video,
-            inputs=[video_input, skeleton_checkbox],
+            inputs=[video_input, skeleton_checkbox, model_dropdown, angle_checkbox],
             outputs=[video_output, analysis_output]
         )
         
@@ -364,7 +895,7 @@ def create_interface():
             - **Follow Through:** Snap your wrist downward after release (goose neck)
             - **Consistency:** Focus on repeating the same motion every time
             
-            **Note:** This tool analyzes right-handed shooters by default. Left-handed version coming soon!
+            **Note:** The shooting arm (left or right) is detected automatically.
             """
         )
     